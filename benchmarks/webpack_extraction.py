@@ -0,0 +1,115 @@
+"""Compares reading whole Humble page with streaming extraction of embedded webpack JSON.
+
+Usage: python benchmarks/webpack_extraction.py [--chunk-delay SECONDS] [page.html ...]
+Without page arguments, synthetic pages similar to `membership/<month>` (~220K) are generated.
+`--chunk-delay` simulates network by delaying every 16K chunk of the response body.
+"""
+import argparse
+import asyncio
+import json
+import pathlib
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / 'src'))
+
+from webservice import _PageDocument  # noqa: E402
+
+
+WEBPACK_ID = 'webpack-monthly-product-data'
+SEARCH = f'<script id="{WEBPACK_ID}" type="application/json">'
+
+
+def synthetic_page(json_position: float, size: int = 220 * 1024) -> str:
+    content_choices = {
+        f'game_{i}': {'title': f'Game {i}', 'platforms': ['windows'], 'delivery_methods': ['steam'], 'description': 'x' * 300}
+        for i in range(40)
+    }
+    webpack = json.dumps({'contentChoiceOptions': {'contentChoiceData': {'initial': {'content_choices': content_choices}}}})
+    filler = '<div class="filler">' + 'lorem ipsum ' * 8 + '</div>\n'
+    fill_count = max(0, size - len(webpack)) // len(filler)
+    before = int(fill_count * json_position)
+    return filler * before + f'{SEARCH}\n{webpack}\n</script>\n' + filler * (fill_count - before)
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, chunk_delay: float):
+        self._body = body
+        self._pos = 0
+        self._chunk_delay = chunk_delay
+        self.content = self
+
+    async def read(self, size: int):
+        await asyncio.sleep(self._chunk_delay)
+        chunk = self._body[self._pos: self._pos + size]
+        self._pos += len(chunk)
+        return chunk
+
+    async def text(self):
+        """The way aiohttp.ClientResponse.text reads the body"""
+        chunks = []
+        while True:
+            chunk = await self.read(_PageDocument.CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b''.join(chunks).decode('utf-8')
+
+    def close(self):
+        pass
+
+    def release(self):
+        pass
+
+
+async def legacy_extract(response):
+    txt = await response.text()
+    json_start = txt.find(SEARCH) + len(SEARCH)
+    candidate = txt[json_start:].strip()
+    parsed, _ = json.JSONDecoder().raw_decode(candidate)
+    return parsed
+
+
+async def streaming_extract(response):
+    return await _PageDocument(response).extract(SEARCH)
+
+
+def measure(extract, body: bytes, chunk_delay: float, repeat: int):
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(extract(FakeResponse(body, chunk_delay)))  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        loop.run_until_complete(extract(FakeResponse(body, chunk_delay)))
+    latency = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    loop.run_until_complete(extract(FakeResponse(body, chunk_delay)))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    loop.close()
+    return latency, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('pages', nargs='*')
+    parser.add_argument('--chunk-delay', type=float, default=0)
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    if args.pages:
+        pages = {p: pathlib.Path(p).read_bytes() for p in args.pages}
+    else:
+        pages = {
+            f'synthetic (json at {int(pos * 100)}%)': synthetic_page(pos).encode()
+            for pos in (0.1, 0.5, 0.9)
+        }
+    print(f'{"page":<28}{"size":>9}{"method":>11}{"latency ms":>12}{"peak KiB":>10}')
+    for name, body in pages.items():
+        for method, extract in [('legacy', legacy_extract), ('streaming', streaming_extract)]:
+            latency, peak = measure(extract, body, args.chunk_delay, args.repeat)
+            print(f'{name:<28}{len(body) // 1024:>8}K{method:>11}{latency * 1000:>12.2f}{peak / 1024:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
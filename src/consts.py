@@ -1,4 +1,5 @@
 import enum
+import pathlib
 import platform
 import sys
 
@@ -24,6 +25,11 @@ NON_GAME_BUNDLE_TYPES = {'mobilebundle', 'softwarebundle', 'bookbundle', 'audiob
 IS_WINDOWS = sys.platform == 'win32'
 IS_MAC = sys.platform == 'darwin'
 
+if IS_WINDOWS:
+    PLUGIN_DATA_DIR = pathlib.Path.home() / "AppData/Local/galaxy-hb"
+else:
+    PLUGIN_DATA_DIR = pathlib.Path.home() / ".config/galaxy-hb"
+
 if platform.machine().endswith('64'):
     CURRENT_BITNESS = BITNESS.B64
 else:
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import time
+import typing as t
+
+import yarl
+from multidict import CIMultiDict, CIMultiDictProxy
+
+
+logger = logging.getLogger(__name__)
+
+
+class CachePolicy(t.NamedTuple):
+    max_age: float = 0
+    """Seconds for which stored response is served without asking the server.
+    After that time request is revalidated with `If-None-Match` / `If-Modified-Since` headers."""
+
+
+class CachedResponse:
+    """Subset of aiohttp.ClientResponse interface for responses served from HttpCache"""
+    def __init__(self, url: str, headers: t.Dict[str, str], body: bytes):
+        self.url = yarl.URL(url)
+        self.status = 200
+        self.headers = CIMultiDictProxy(CIMultiDict(headers))
+        self._body = body
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: str = 'utf-8') -> str:
+        return self._body.decode(encoding)
+
+    async def json(self) -> t.Any:
+        return json.loads(self._body)
+
+    def raise_for_status(self):
+        pass
+
+    def release(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CacheEntry(t.NamedTuple):
+    url: str
+    headers: t.Dict[str, str]
+    stored_at: float
+    last_used: float
+    size: int
+
+    @property
+    def validators(self) -> t.Dict[str, str]:
+        conditional = {}
+        if 'ETag' in self.headers:
+            conditional['If-None-Match'] = self.headers['ETag']
+        if 'Last-Modified' in self.headers:
+            conditional['If-Modified-Since'] = self.headers['Last-Modified']
+        return conditional
+
+
+class HttpCache:
+    """Conditional HTTP cache stored on disk.
+    Only responses having `ETag` or `Last-Modified` headers are stored.
+    Least recently used entries are evicted when total body size exceeds `max_size`.
+    """
+    INDEX_FILE = 'index.json'
+    STORED_HEADERS = ('ETag', 'Last-Modified', 'Content-Type')
+
+    def __init__(self, directory: pathlib.Path, max_size: int = 100 * 1024 ** 2):
+        self._dir = directory
+        self._max_size = max_size
+        self._owner: t.Optional[str] = None
+        self._index: t.Optional[t.Dict[str, CacheEntry]] = None
+
+    @staticmethod
+    def make_key(url: str, params: t.Any = None) -> str:
+        full_url = yarl.URL(url)
+        if params:
+            full_url = full_url.update_query(params)
+        return hashlib.sha1(str(full_url).encode()).hexdigest()
+
+    @staticmethod
+    def is_cacheable(headers: t.Mapping[str, str]) -> bool:
+        if 'no-store' in headers.get('Cache-Control', ''):
+            return False
+        return 'ETag' in headers or 'Last-Modified' in headers
+
+    @property
+    def size(self) -> int:
+        return sum(entry.size for entry in self._entries.values())
+
+    @property
+    def _entries(self) -> t.Dict[str, CacheEntry]:
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index
+
+    def bind_owner(self, user_id: str):
+        """Drops all entries stored for other user than `user_id`"""
+        self._entries  # ensure loaded
+        if self._owner != user_id:
+            if self._owner is not None:
+                logger.info('HTTP cache owner changed; clearing the cache')
+            self.clear()
+            self._owner = user_id
+            self._save_index()
+
+    def get(self, key: str) -> t.Optional[CacheEntry]:
+        return self._entries.get(key)
+
+    def is_fresh(self, entry: CacheEntry, policy: CachePolicy) -> bool:
+        return time.time() - entry.stored_at < policy.max_age
+
+    def response(self, key: str) -> t.Optional[CachedResponse]:
+        """Returns stored response and marks it as recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        try:
+            body = self._body_path(key).read_bytes()
+        except OSError as e:
+            logger.warning(f'Cannot read cached body of {entry.url}: {e!r}')
+            self._remove(key)
+            return None
+        self._entries[key] = entry._replace(last_used=time.time())
+        return CachedResponse(entry.url, entry.headers, body)
+
+    def revalidated(self, key: str):
+        """Marks stored response as confirmed by server (after 304 Not Modified)"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            now = time.time()
+            self._entries[key] = entry._replace(stored_at=now, last_used=now)
+            self._save_index()
+
+    def store(self, key: str, url: str, headers: t.Mapping[str, str], body: bytes):
+        if len(body) > self._max_size:
+            return
+        now = time.time()
+        stored_headers = {h: headers[h] for h in self.STORED_HEADERS if h in headers}
+        try:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            self._body_path(key).write_bytes(body)
+        except OSError as e:
+            logger.warning(f'Cannot store response of {url} in cache: {e!r}')
+            return
+        self._entries[key] = CacheEntry(url, stored_headers, now, now, len(body))
+        self._evict()
+        self._save_index()
+
+    def clear(self):
+        for key in list(self._entries):
+            self._remove(key)
+
+    def _evict(self):
+        total = self.size
+        by_usage = sorted(self._entries.items(), key=lambda item: item[1].last_used)
+        for key, entry in by_usage:
+            if total <= self._max_size:
+                break
+            logger.debug(f'Evicting {entry.url} from HTTP cache')
+            self._remove(key)
+            total -= entry.size
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        try:
+            self._body_path(key).unlink()
+        except OSError:
+            pass
+
+    def _body_path(self, key: str) -> pathlib.Path:
+        return self._dir / f'{key}.body'
+
+    def _load_index(self) -> t.Dict[str, CacheEntry]:
+        try:
+            with open(self._dir / self.INDEX_FILE, 'r') as f:
+                raw = json.load(f)
+            self._owner = raw['owner']
+            return {key: CacheEntry(**entry) for key, entry in raw['entries'].items()}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f'Cannot load HTTP cache index, starting from scratch: {e!r}')
+            return {}
+
+    def _save_index(self):
+        raw = {
+            'owner': self._owner,
+            'entries': {key: entry._asdict() for key, entry in self._entries.items()}
+        }
+        tmp_path = self._dir / (self.INDEX_FILE + '.tmp')
+        try:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(raw, f)
+            os.replace(tmp_path, self._dir / self.INDEX_FILE)
+        except OSError as e:
+            logger.warning(f'Cannot save HTTP cache index: {e!r}')
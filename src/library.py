@@ -2,14 +2,18 @@ from functools import reduce
 from math import ceil
 import logging
 import asyncio
+import time
 from typing import Callable, Dict, List, Sequence, Set, Iterable, Any, Coroutine, NamedTuple, TypeVar, Generator
 
+from galaxy.api.errors import BackendError, BackendNotAvailable, TooManyRequests
+
 from consts import SOURCE, NON_GAME_BUNDLE_TYPES, COMMA_SPLIT_BLACKLIST
 from model.product import Product
 from model.game import HumbleGame, Subproduct, Key, KeyGame
 from model.types import GAME_PLATFORMS
 from settings import LibrarySettings
-from webservice import AuthorizedHumbleAPI
+from utils.concurrency import AIMDLimiter
+from webservice import AuthorizedHumbleAPI, get_retry_after
 
 
 logger = logging.getLogger(__name__)
@@ -24,7 +28,10 @@ class KeyInfo(NamedTuple):
 
 
 class LibraryResolver:
-    ORDERS_CHUNK_SIZE = 35
+    ORDERS_CHUNK_SIZE = 35  # initial; tuned by response time
+    MIN_ORDERS_CHUNK_SIZE = 5
+    MAX_ORDERS_URL_LENGTH = 2048
+    TARGET_CHUNK_LATENCY = 5.0
 
     def __init__(
         self, 
@@ -37,6 +44,13 @@ class LibraryResolver:
         self._save_cache = save_cache_callback
         self._settings = settings
         self._cache = cache
+        self._limiter = AIMDLimiter(target_latency=self.TARGET_CHUNK_LATENCY)
+        self._chunk_size = self.ORDERS_CHUNK_SIZE
+
+    @property
+    def orders_fetch_params(self) -> Dict[str, Any]:
+        """Currently chosen parameters of bulk orders fetching"""
+        return {'chunk_size': self._chunk_size, **self._limiter.stats}
 
     async def __call__(self, only_cache: bool = False) -> Dict[str, HumbleGame]:
 
@@ -70,14 +84,57 @@ class LibraryResolver:
 
     async def _fetch_orders(self) -> Dict[str, dict]:
         gamekeys = await self._api.get_gamekeys()
-        gamekey_chunks = self._make_chunks(gamekeys, size=self.ORDERS_CHUNK_SIZE)
-        api_calls = [self._api.get_orders_bulk_details(chunk) for chunk in gamekey_chunks]
-        call_results = await asyncio.gather(*api_calls)
-        orders: Dict[str, Any] = reduce(lambda cum, nxt: {**cum, **nxt}, call_results, {})
+        orders = await self._fetch_orders_details(gamekeys)
         not_null_orders = {k: v for k, v in orders.items() if v is not None}
         filtered_orders = self.__filter_out_not_game_bundles(not_null_orders)
         return filtered_orders
 
+    async def _fetch_orders_details(self, gamekeys: Sequence[str]) -> Dict[str, Any]:
+        """Fetches orders in chunks with concurrency and chunk size adjusted to server responsiveness"""
+        tasks: List[asyncio.Future] = []
+        pending = list(gamekeys)
+        try:
+            while pending:
+                await self._limiter.acquire()
+                self._chunk_size = min(self._chunk_size, self._max_chunk_size(pending))
+                chunk, pending = pending[:self._chunk_size], pending[self._chunk_size:]
+                tasks.append(asyncio.ensure_future(self._fetch_orders_chunk(chunk)))
+            call_results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        logger.info(f'Fetched {len(gamekeys)} orders in {len(tasks)} chunks; params: {self.orders_fetch_params}')
+        return reduce(lambda cum, nxt: {**cum, **nxt}, call_results, {})
+
+    async def _fetch_orders_chunk(self, chunk: Sequence[str]) -> Dict[str, Any]:
+        start = time.monotonic()
+        try:
+            result = await self._api.get_orders_bulk_details(chunk)
+        except (TooManyRequests, BackendNotAvailable, BackendError) as e:
+            await self._limiter.release(time.monotonic() - start, overloaded=True, retry_after=get_retry_after(e))
+            raise
+        except BaseException:
+            await self._limiter.release(time.monotonic() - start)
+            raise
+        latency = time.monotonic() - start
+        await self._limiter.release(latency)
+        self._tune_chunk_size(latency)
+        return result
+
+    def _tune_chunk_size(self, latency: float):
+        if latency > self.TARGET_CHUNK_LATENCY:
+            self._chunk_size = max(self.MIN_ORDERS_CHUNK_SIZE, int(self._chunk_size * 0.75))
+        elif latency < self.TARGET_CHUNK_LATENCY / 4:
+            self._chunk_size = int(self._chunk_size * 1.25)
+
+    @classmethod
+    def _max_chunk_size(cls, gamekeys: Sequence[str]) -> int:
+        """Maximal number of gamekeys that fits in bulk orders url"""
+        base_length = len(AuthorizedHumbleAPI._AUTHORITY + AuthorizedHumbleAPI._ORDERS_BULK_URL + '?all_tpkds=true')
+        param_length = len('&gamekeys=') + max(len(gk) for gk in gamekeys)
+        return max(1, (cls.MAX_ORDERS_URL_LENGTH - base_length) // param_length)
+
     @staticmethod
     def _make_chunks(items: Sequence[T],  size: int) -> Generator[Sequence[T], None, None]:
         for i in range(ceil(len(items) / size)):
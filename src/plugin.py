@@ -20,9 +20,10 @@ from galaxy.api.consts import Platform, OSCompatibility
 from galaxy.api.types import Authentication, NextStep, LocalGame, GameLibrarySettings, Subscription, SubscriptionGame
 from galaxy.api.errors import AuthenticationRequired, UnknownBackendResponse, UnknownError, BackendError
 
-from consts import IS_WINDOWS, TROVE_SUBSCRIPTION_NAME
+from consts import IS_WINDOWS, TROVE_SUBSCRIPTION_NAME, PLUGIN_DATA_DIR
 from settings import Settings
 from webservice import AuthorizedHumbleAPI
+from http_cache import HttpCache
 from model.game import TroveGame, Key, Subproduct, HumbleGame, ChoiceGame
 from model.types import HP
 from humbledownloader import HumbleDownloadResolver
@@ -64,7 +65,7 @@ class HumbleBundlePlugin(Plugin):
     def __init__(self, reader, writer, token):
         super().__init__(Platform.HumbleBundle, __version__, reader, writer, token)
         headers = {"User-Agent": f"HumbleBundle plugin for GOG Galaxy 2.0 v{__version__}"}
-        self._api = AuthorizedHumbleAPI(headers=headers)
+        self._api = AuthorizedHumbleAPI(headers=headers, http_cache=HttpCache(PLUGIN_DATA_DIR / 'http_cache'))
         self._download_resolver = HumbleDownloadResolver()
         self._app_finder = AppFinder()
         self._settings = Settings()
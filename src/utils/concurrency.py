@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class AIMDLimiter:
+    """Limits number of concurrent operations with additive increase / multiplicative decrease policy.
+    The limit grows by one after a window of `limit` healthy operations and is cut by `decrease_factor`
+    on overload signals: throttling, server errors or latency above `target_latency`.
+    """
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 16,
+        target_latency: float = 5.0,
+        decrease_factor: float = 0.5,
+    ):
+        self._limit = float(initial)
+        self._min = minimum
+        self._max = maximum
+        self._target_latency = target_latency
+        self._decrease_factor = decrease_factor
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._overloads = 0
+        self.__cond: Optional[asyncio.Condition] = None
+
+    @property
+    def _cond(self) -> asyncio.Condition:
+        if self.__cond is None:
+            self.__cond = asyncio.Condition()
+        return self.__cond
+
+    @property
+    def limit(self) -> int:
+        return max(self._min, int(self._limit))
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'limit': self.limit,
+            'in_flight': self._in_flight,
+            'overloads': self._overloads,
+            'paused_for': max(0.0, self._paused_until - time.monotonic()),
+        }
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            logger.info(f'Waiting {delay:.1f}s before next request as requested by server')
+            await asyncio.sleep(delay)
+
+    async def release(self, latency: float, overloaded: bool = False, retry_after: Optional[float] = None):
+        """
+        :param latency:     duration of finished operation
+        :param overloaded:  operation ended with throttling or server error
+        :param retry_after: seconds the server asked to wait before next request
+        """
+        now = time.monotonic()
+        async with self._cond:
+            self._in_flight -= 1
+            if overloaded or latency > self._target_latency:
+                self._decrease(now, latency)
+            else:
+                self._limit = min(self._max, self._limit + 1 / self._limit)
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            self._cond.notify_all()
+
+    def _decrease(self, now: float, latency: float):
+        self._overloads += 1
+        # operations started before the last decrease could not be affected by it
+        if now - self._last_decrease < latency:
+            return
+        self._last_decrease = now
+        self._limit = max(self._min, self._limit * self._decrease_factor)
+        logger.info(f'Concurrency limit decreased to {self.limit}')
@@ -0,0 +1,99 @@
+import enum
+import logging
+import random
+import time
+from typing import NamedTuple, Optional, Tuple
+
+from galaxy.api.errors import BackendNotAvailable
+
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy(NamedTuple):
+    attempts: int = 3
+    """Maximal number of retries of a single request"""
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    """Upper limit for backoff; requests with longer `Retry-After` are not retried"""
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+NO_RETRY = RetryPolicy(attempts=0)
+
+
+class RetryBudget:
+    """Limits retries to a fraction of all requests, so retries cannot multiply load of failing server.
+    Every request deposits `ratio` of a token, every retry withdraws one token.
+    """
+    def __init__(self, ratio: float = 0.2, min_tokens: float = 10, max_tokens: float = 100):
+        self._ratio = ratio
+        self._max_tokens = max_tokens
+        self._tokens = min_tokens
+
+    def deposit(self):
+        self._tokens = min(self._max_tokens, self._tokens + self._ratio)
+
+    def withdraw(self) -> bool:
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class CircuitOpenError(BackendNotAvailable):
+    pass
+
+
+class CircuitState(enum.Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """Fails fast after `failure_threshold` consecutive failures.
+    After `reset_timeout` one trial request is let through; its success closes the circuit again.
+    """
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60):
+        self.name = name
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_progress = False
+
+    @property
+    def state(self) -> CircuitState:
+        if self._opened_at is None:
+            return CircuitState.CLOSED
+        if time.monotonic() - self._opened_at >= self._reset_timeout:
+            return CircuitState.HALF_OPEN
+        return CircuitState.OPEN
+
+    def check(self):
+        """Raises CircuitOpenError if request should not be sent"""
+        state = self.state
+        if state == CircuitState.OPEN or (state == CircuitState.HALF_OPEN and self._trial_in_progress):
+            raise CircuitOpenError(f'{self.name} endpoints are failing; not sending requests for a while')
+        if state == CircuitState.HALF_OPEN:
+            self._trial_in_progress = True
+
+    def record_success(self):
+        if self._opened_at is not None:
+            logger.info(f'Circuit for {self.name} closed')
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_in_progress = False
+        if self.state == CircuitState.HALF_OPEN or self._failures >= self._failure_threshold:
+            if self.state != CircuitState.OPEN:
+                logger.warning(f'Circuit for {self.name} opened after {self._failures} failures')
+            self._opened_at = time.monotonic()
@@ -3,14 +3,24 @@ from http import HTTPStatus
 from contextlib import contextmanager
 import typing as t
 import aiohttp
+import asyncio
+import codecs
+import email.utils
+import enum
 import json
 import base64
 import logging
+import time
 
 import yarl
 import galaxy.http
-from galaxy.api.errors import UnknownBackendResponse, AuthenticationRequired
+from galaxy.api.errors import (
+    UnknownBackendResponse, AuthenticationRequired,
+    BackendError, BackendNotAvailable, BackendTimeout, NetworkError, TooManyRequests
+)
 
+from http_cache import HttpCache, CachePolicy, CachedResponse
+from utils.resilience import RetryPolicy, RetryBudget, CircuitBreaker, NO_RETRY
 from model.download import  DownloadStructItem
 from model.subscription import MontlyContentData, ChoiceContentData, ChoiceMonth
 
@@ -29,10 +39,171 @@ def handle_exception():
             raise
 
 
+def _parse_retry_after(value: str) -> t.Optional[float]:
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_retry_after(error: BaseException) -> t.Optional[float]:
+    """Seconds from `Retry-After` header of the response that caused `error`, if any"""
+    cause: t.Optional[BaseException] = error
+    while cause is not None:
+        if isinstance(cause, aiohttp.ClientResponseError) and cause.headers:
+            value = cause.headers.get('Retry-After')
+            return None if value is None else _parse_retry_after(value)
+        cause = cause.__context__
+    return None
+
+
 class WebpackParseError(UnknownBackendResponse):
     pass
 
 
+class EndpointFamily(enum.Enum):
+    ORDERS = 'orders'
+    SUBSCRIPTION = 'subscription'
+    PAGES = 'pages'
+    DOWNLOAD = 'download'
+
+
+class _DocumentTruncated(Exception):
+    """Searched data may be placed in the part of the page that was not read"""
+
+
+class _PageDocument:
+    """Html page read incrementally: only as far as data extractors need it.
+    Connection is closed as soon as there is no extractor reading the document.
+    """
+    CHUNK_SIZE = 16 * 1024
+    _SCRIPT_END = '</script>'
+
+    def __init__(self, response: t.Union[aiohttp.ClientResponse, CachedResponse]):
+        self._response = response
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._parts: t.List[str] = []
+        self._size = 0
+        self._lock = asyncio.Lock()
+        self._readers = 0
+        self._complete = False
+        self._closed = False
+
+    async def _read_chunk(self) -> bytes:
+        if isinstance(self._response, CachedResponse):
+            self._complete = True
+            return await self._response.read()
+        return await self._response.content.read(self.CHUNK_SIZE)
+
+    @property
+    def read_size(self) -> int:
+        return self._size
+
+    @property
+    def _text(self) -> str:
+        if len(self._parts) > 1:
+            self._parts = [''.join(self._parts)]
+        return self._parts[0] if self._parts else ''
+
+    async def _read_more(self) -> t.Optional[str]:
+        if self._closed or self._complete:
+            return None
+        chunk = await self._read_chunk()
+        if not chunk:
+            self._complete = True
+        text = self._decoder.decode(chunk, final=self._complete)
+        self._parts.append(text)
+        self._size += len(text)
+        return text if chunk else None
+
+    async def _find(self, sub: str, start: int) -> int:
+        """Finds `sub` in the document reading as much as needed.
+        New chunks are searched together with the tail of already read text
+        to not join the whole document on every read.
+        """
+        pos = self._text.find(sub, start)
+        tail = self._text[max(start, self._size - len(sub) + 1):]
+        while pos == -1:
+            tail_start = self._size - len(tail)
+            chunk = await self._read_more()
+            if chunk is None:
+                return -1
+            window = tail + chunk
+            pos = window.find(sub)
+            if pos != -1:
+                pos += tail_start
+            tail = window[-(len(sub) - 1):] if len(sub) > 1 else ''
+        return pos
+
+    def _close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._complete:
+            self._response.release()
+        else:
+            logger.debug(f'Closing page connection after reading {self.read_size} characters')
+            self._response.close()
+
+    async def extract(self, search: str) -> t.Any:
+        """Decodes JSON document embedded in html page just after `search` phrase"""
+        self._readers += 1
+        try:
+            async with self._lock:
+                begin = await self._find(search, 0)
+                if begin == -1:
+                    if self._complete:
+                        raise WebpackParseError(f'{search} not found')
+                    raise _DocumentTruncated()
+                begin += len(search)
+                end = await self._find(self._SCRIPT_END, begin)
+                candidate = self._text[begin:end if end != -1 else None].strip()
+        finally:
+            self._readers -= 1
+            if self._readers == 0:
+                self._close()
+        try:
+            parsed, _ = json.JSONDecoder().raw_decode(candidate)
+            return parsed
+        except json.JSONDecodeError as e:
+            raise WebpackParseError() from e
+
+
+class _PageCache:
+    """Short-living cache of html pages shared by all data extractors.
+    Concurrent callers asking for the same page await the same in-flight fetch.
+    """
+    TTL = 10
+
+    def __init__(self, fetch: t.Callable[[str], t.Awaitable[_PageDocument]], ttl: float = TTL):
+        self._fetch = fetch
+        self._ttl = ttl
+        self._pages: t.Dict[str, t.Tuple[float, asyncio.Future]] = {}
+
+    async def get(self, path: str) -> _PageDocument:
+        now = time.monotonic()
+        entry = self._pages.get(path)
+        if entry is None or now - entry[0] > self._ttl:
+            entry = (now, asyncio.ensure_future(self._fetch(path)))
+            self._pages[path] = entry
+        try:
+            return await asyncio.shield(entry[1])
+        except Exception:
+            if self._pages.get(path) is entry:
+                del self._pages[path]
+            raise
+
+    def invalidate(self, path: str):
+        self._pages.pop(path, None)
+
+    def clear(self):
+        self._pages.clear()
+
+
 class AuthorizedHumbleAPI:
     _AUTHORITY = "https://www.humblebundle.com/"
     _PROCESS_LOGIN = "processlogin"
@@ -55,20 +226,126 @@ class AuthorizedHumbleAPI:
         "Keep-Alive": "true",
     }
 
-    def __init__(self, headers: t.Dict[str, t.Any]):
+    HTTP_CACHE_POLICIES: t.Dict[EndpointFamily, CachePolicy] = {
+        EndpointFamily.ORDERS: CachePolicy(max_age=0),
+        EndpointFamily.SUBSCRIPTION: CachePolicy(max_age=0),
+        EndpointFamily.PAGES: CachePolicy(max_age=0),
+    }
+
+    _RETRYABLE_ERRORS = (BackendError, BackendNotAvailable, BackendTimeout, NetworkError, TooManyRequests)
+
+    def __init__(
+        self,
+        headers: t.Dict[str, t.Any],
+        http_cache: t.Optional[HttpCache] = None,
+        retry_policy: RetryPolicy = RetryPolicy(),
+    ):
         headers={**self._DEFAULT_HEADERS, **headers}
         self._session = galaxy.http.create_client_session(headers=headers)
+        self._page_cache = _PageCache(self._fetch_page)
+        self._http_cache = http_cache
+        self._retry_policy = retry_policy
+        self._retry_budget = RetryBudget()
+        self._circuit_breakers = {family: CircuitBreaker(family.value) for family in EndpointFamily}
 
     @property
     def is_authenticated(self) -> bool:
         return bool(self._session.cookie_jar)
 
-    async def _request(self, method, path, *args, **kwargs):
+    @classmethod
+    def _endpoint_family(cls, path: str) -> EndpointFamily:
+        path = path.lstrip('/')
+        if path.startswith(('api/v1/order', 'api/v1/user/order')):
+            return EndpointFamily.ORDERS
+        if path.startswith('api/v1/subscriptions'):
+            return EndpointFamily.SUBSCRIPTION
+        if path in (cls._DOWNLOAD_SIGN, cls._HUMBLER_REDEEM_DOWNLOAD):
+            return EndpointFamily.DOWNLOAD
+        return EndpointFamily.PAGES
+
+    async def _request(self, method, path, *args, retry: t.Optional[bool] = None, **kwargs):
+        """
+        :param retry: retry on server errors and connection problems;
+                      by default only idempotent GET requests are retried
+        """
         url = self._AUTHORITY + path
         logger.debug(f'{method}, {url}, {args}, {kwargs}')
+        family = self._endpoint_family(path)
+        breaker = self._circuit_breakers[family]
+        if retry is None:
+            retry = method.lower() == 'get'
+        policy = self._retry_policy if retry else NO_RETRY
+        self._retry_budget.deposit()
+
+        attempt = 0
+        while True:
+            breaker.check()
+            try:
+                res = await self._send(method, url, family, *args, **kwargs)
+            except self._RETRYABLE_ERRORS as e:
+                breaker.record_failure()
+                delay = self._retry_delay(policy, attempt, get_retry_after(e))
+                if delay is None:
+                    raise
+                logger.warning(f'{e!r} for {method} {url}; retrying in {delay:.2f}s')
+            else:
+                if res.status not in policy.retry_statuses:
+                    breaker.record_success()
+                    return res
+                breaker.record_failure()
+                retry_after = res.headers.get('Retry-After')
+                delay = self._retry_delay(policy, attempt, _parse_retry_after(retry_after) if retry_after else None)
+                if delay is None:
+                    return res
+                logger.warning(f'Status {res.status} for {method} {url}; retrying in {delay:.2f}s')
+                res.release()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, policy: RetryPolicy, attempt: int, retry_after: t.Optional[float]) -> t.Optional[float]:
+        """Returns delay before next attempt or None if request should not be retried"""
+        if attempt >= policy.attempts:
+            return None
+        if retry_after is not None and retry_after > policy.max_delay:
+            return None
+        if not self._retry_budget.withdraw():
+            logger.warning('Retry budget exhausted')
+            return None
+        return max(retry_after or 0, policy.backoff(attempt))
+
+    async def _send(self, method, url, family: EndpointFamily, *args, **kwargs):
+        if self._http_cache is not None and method.lower() == 'get':
+            policy = self.HTTP_CACHE_POLICIES.get(family)
+            if policy is not None:
+                return await self._cached_request(method, url, policy, *args, **kwargs)
         with handle_exception():
             return await self._session.request(method, url, *args, **kwargs)
 
+    async def _cached_request(self, method, url, policy: CachePolicy, *args, **kwargs):
+        assert self._http_cache is not None
+        key = self._http_cache.make_key(url, kwargs.get('params'))
+        entry = self._http_cache.get(key)
+        if entry is not None:
+            if self._http_cache.is_fresh(entry, policy):
+                cached = self._http_cache.response(key)
+                if cached is not None:
+                    return cached
+            kwargs['headers'] = {**kwargs.get('headers', {}), **entry.validators}
+        with handle_exception():
+            res = await self._session.request(method, url, *args, **kwargs)
+            if res.status == HTTPStatus.NOT_MODIFIED:
+                cached = self._http_cache.response(key)
+                if cached is not None:
+                    logger.debug(f'Not modified: {url}, using cached response')
+                    res.release()
+                    self._http_cache.revalidated(key)
+                    return cached
+            if res.status == HTTPStatus.OK and self._http_cache.is_cacheable(res.headers):
+                body = await res.read()
+                self._http_cache.store(key, url, res.headers, body)
+                return CachedResponse(url, dict(res.headers), body)
+            return res
+
     async def _validate_authentication(self) -> None:
         """Raises galaxy.api.errors.AuthenticationRequired when session got invalidated."""
         with handle_exception():
@@ -93,8 +370,12 @@ class AuthorizedHumbleAPI:
         cookie[auth_cookie['name']] = cookie_val
 
         self._session.cookie_jar.update_cookies(cookie)
+        self._page_cache.clear()
+        user_id = self._decode_user_id(cookie_val)
+        if self._http_cache is not None:
+            self._http_cache.bind_owner(user_id)
         await self._validate_authentication()
-        return self._decode_user_id(cookie_val)
+        return user_id
 
     async def get_gamekeys(self) -> t.List[str]:
         res = await self._request('get', self._ORDER_LIST_URL)
@@ -204,18 +485,27 @@ class AuthorizedHumbleAPI:
                 yield ChoiceMonth(prev_month)
             from_product = prev_month['machine_name']
 
-    async def _get_webpack_data(self, path: str, webpack_id: str) -> dict:
+    async def _fetch_page(self, path: str) -> _PageDocument:
         res = await self._request('GET', path)
-        txt = await res.text()
-        search = f'<script id="{webpack_id}" type="application/json">'
-        json_start = txt.find(search) + len(search)
-        candidate = txt[json_start:].strip()
+        return _PageDocument(res)
+
+    async def _extract_from_page(self, path: str, search: str) -> t.Any:
+        document = await self._page_cache.get(path)
         try:
-            parsed, _ = json.JSONDecoder().raw_decode(candidate)
-            return parsed
-        except json.JSONDecodeError as e:
-            raise WebpackParseError() from e
-    
+            return await document.extract(search)
+        except _DocumentTruncated:
+            logger.debug(f'{search} not found in already read part of page {path}. Fetching again')
+            self._page_cache.invalidate(path)
+        document = await self._page_cache.get(path)
+        try:
+            return await document.extract(search)
+        except _DocumentTruncated as e:
+            raise WebpackParseError(f'{search} not found') from e
+
+    async def _get_webpack_data(self, path: str, webpack_id: str) -> dict:
+        search = f'<script id="{webpack_id}" type="application/json">'
+        return await self._extract_from_page(path, search)
+
     async def get_user_subscription_state(self) -> dict:
         """
         for not subscriber:
@@ -233,17 +523,9 @@ class AuthorizedHumbleAPI:
         return await self._get_window_models(self._MAIN_PAGE, "userSubscriptionState")
     
     async def _get_window_models(self, path: str, model_name: str) -> dict:
-        res = await self._request('GET', path)
-        txt = await res.text()
         search = f'window.models.{model_name} = '
-        json_start = txt.find(search) + len(search)
-        candidate = txt[json_start:].strip()
-        try:
-            parsed, _ = json.JSONDecoder().raw_decode(candidate)
-            return parsed
-        except json.JSONDecodeError as e:
-            raise WebpackParseError() from e
-        
+        return await self._extract_from_page(path, search)
+
     async def get_subscriber_hub_data(self) -> dict:
         """
         Raises `WebpackParseError` when user was never a subscriber
@@ -286,7 +568,7 @@ class AuthorizedHumbleAPI:
         res = await self._request('post', self._DOWNLOAD_SIGN, params={
             'machine_name': machine_name,
             'filename': filename
-        })
+        }, retry=True)
         return await res.json()
     
     async def _reedem_download(self, download_machine_name: str, custom_data: dict):
@@ -298,7 +580,7 @@ class AuthorizedHumbleAPI:
             'download_page': "false",  # TODO check what it does
         }
         params.update(custom_data)
-        res = await self._request('post', self._HUMBLER_REDEEM_DOWNLOAD, params=params)
+        res = await self._request('post', self._HUMBLER_REDEEM_DOWNLOAD, params=params, retry=True)
         content = await res.read()
         if content != b"{'success': True}":
             raise UnknownBackendResponse(f'unexpected response while reedem trove download: {content}')
@@ -1,11 +1,15 @@
 import json
-from unittest.mock import patch, Mock
+import asyncio
+from unittest.mock import patch
 
-from galaxy.api.errors import BackendError
-from galaxy.unittest.mock import async_raise, async_return_value
+from freezegun import freeze_time
+from galaxy.api.errors import BackendError, TooManyRequests
+from galaxy.unittest.mock import async_raise
 import pytest
+from yarl import URL
 
-from webservice import AuthorizedHumbleAPI
+from utils.resilience import RetryPolicy
+from webservice import AuthorizedHumbleAPI, WebpackParseError, _PageDocument, _DocumentTruncated, get_retry_after
 
 
 @pytest.fixture
@@ -16,7 +20,7 @@ def client_session():
 
 @pytest.fixture
 def api():
-    return AuthorizedHumbleAPI(headers={})
+    return AuthorizedHumbleAPI(headers={}, retry_policy=RetryPolicy(base_delay=0))
 
 
 def test_filename_from_web_link(api):
@@ -27,13 +31,13 @@ def test_filename_from_web_link(api):
 
 @pytest.mark.asyncio
 async def test_handle_exception(client_session, api):
-    client_session.request.return_value = async_raise(BackendError)
+    client_session.request.side_effect = lambda *args, **kwargs: async_raise(BackendError)
     with pytest.raises(BackendError):
         await api._get_webpack_data("mock_path", "mock_webpack_id")
 
 
 @pytest.mark.asyncio
-async def test_get_user_subscription_state(client_session, api):
+async def test_get_user_subscription_state(api, aioresponse):
     subscription_state_raw = '{"newestOwnedTier": "basic", "nextBilledPlan": "monthly_v2_basic", "consecutiveContentDropCount": 12, "canResubscribe": false, "currentlySkippingContentHumanName": null, "perksStatus": "active", "billDate": "2021-11-30T18:00:00", "monthlyNewestOwnedContentMachineName": "october_2021_choice", "willReceiveFutureMonths": true, "monthlyOwnsActiveContent": false, "unpauseDt": "2021-12-07T18:00:00", "creditsRemaining": 0, "currentlySkippingContentMachineName": null, "canBeConvertedFromGiftSubToPayingSub": false, "lastSkippedContentMachineName": "january_2021_choice", "contentEndDateAfterBillDate": "2021-12-07T18:00:00", "isPaused": false, "monthlyNewestOwnedContentGamekey": "xVr5VcHnrd4KFATZ", "failedBillingMonths": 0, "monthlyNewestSkippedContentEnd": "2021-02-05T18:00:00", "wasPaused": false, "monthlyPurchasedAnyContent": true, "monthlyNewestOwnedContentEnd": "2021-11-02T17:00:00", "monthlyOwnsAnyContent": true}'
     shorten_page_source = R"""
 <!doctype html>
@@ -210,9 +214,7 @@ if (window.models.userSubscriptionState.perksStatus === 'active') {
 </html>
 """ % subscription_state_raw
 
-    response_mock = Mock(spec=())
-    response_mock.text = Mock(return_value=async_return_value(shorten_page_source))
-    client_session.request.return_value = async_return_value(response_mock)
+    aioresponse.get("https://www.humblebundle.com/", body=shorten_page_source)
 
     result = await api.get_user_subscription_state()
 
@@ -239,3 +241,147 @@ async def test_get_orders_bulk_details(api, aioresponse, gamekeys, expected_url)
     result = await api.get_orders_bulk_details(gamekeys)
 
     assert result == stubbed_response
+
+
+MAIN_PAGE_URL = "https://www.humblebundle.com/"
+MAIN_PAGE_SOURCE = R"""
+<script>
+  window.models.userSubscriptionState = {"perksStatus": "active"};
+</script>
+<script id="webpack-json-data" type="application/json">
+  {"userOptions": {"email": "redacted@redacted.com"}}
+</script>
+"""
+
+
+def requests_count(aioresponse, url):
+    return len(aioresponse.requests.get(('GET', URL(url)), []))
+
+
+@pytest.fixture
+def main_page_response(aioresponse):
+    aioresponse.get(MAIN_PAGE_URL, body=MAIN_PAGE_SOURCE, repeat=True)
+
+
+@pytest.mark.asyncio
+async def test_main_page_fetched_once_for_all_extractors(api, aioresponse, main_page_response):
+    subscription_state = await api.get_user_subscription_state()
+    webpack_data = await api.get_main_page_webpack_data()
+
+    assert subscription_state == {"perksStatus": "active"}
+    assert webpack_data == {"userOptions": {"email": "redacted@redacted.com"}}
+    assert requests_count(aioresponse, MAIN_PAGE_URL) == 1
+
+
+@pytest.mark.asyncio
+async def test_main_page_concurrent_fetches_share_one_request(api, aioresponse, main_page_response):
+    await asyncio.gather(
+        api.get_user_subscription_state(),
+        api.get_main_page_webpack_data(),
+        api.get_main_page_webpack_data(),
+    )
+    assert requests_count(aioresponse, MAIN_PAGE_URL) == 1
+
+
+@pytest.mark.asyncio
+async def test_main_page_fetched_again_after_ttl(api, aioresponse, main_page_response):
+    with freeze_time('2022-05-01 12:00:00') as frozen_time:
+        await api.get_main_page_webpack_data()
+        frozen_time.tick(api._page_cache.TTL + 1)
+        await api.get_main_page_webpack_data()
+    assert requests_count(aioresponse, MAIN_PAGE_URL) == 2
+
+
+@pytest.mark.asyncio
+async def test_main_page_failed_fetch_not_cached(client_session, api):
+    client_session.request.side_effect = lambda *args, **kwargs: async_raise(BackendError)
+    with pytest.raises(BackendError):
+        await api.get_main_page_webpack_data()
+    assert api._page_cache._pages == {}
+
+
+# ------ streaming page documents ------
+
+class StreamedResponse:
+    """Fake of aiohttp.ClientResponse serving body in small chunks"""
+    def __init__(self, body: str, chunk_size: int):
+        self._body = body.encode()
+        self._chunk_size = chunk_size
+        self.read_bytes = 0
+        self.closed = False
+        self.released = False
+        self.content = self
+
+    async def read(self, _):
+        chunk = self._body[self.read_bytes: self.read_bytes + self._chunk_size]
+        self.read_bytes += len(chunk)
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+    def release(self):
+        self.released = True
+
+
+@pytest.mark.asyncio
+async def test_page_document_stops_reading_after_embedded_json():
+    page = '<script>window.models.a = {"x": "</scr"};</script>' + '<p>tail</p>' * 1000
+    response = StreamedResponse(page, chunk_size=16)
+
+    result = await _PageDocument(response).extract('window.models.a = ')
+
+    assert result == {"x": "</scr"}
+    assert response.read_bytes < 100
+    assert response.closed
+
+
+@pytest.mark.asyncio
+async def test_page_document_search_phrase_split_between_chunks():
+    page = '<p>head</p><script id="webpack-x" type="application/json">\n  [1, 2, 3]\n</script>'
+    for chunk_size in [1, 7, 16, 1000]:
+        result = await _PageDocument(StreamedResponse(page, chunk_size)).extract(
+            '<script id="webpack-x" type="application/json">')
+        assert result == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_page_document_not_found():
+    response = StreamedResponse('<p>no data</p>', chunk_size=4)
+    with pytest.raises(WebpackParseError):
+        await _PageDocument(response).extract('window.models.a = ')
+    assert response.released
+
+
+@pytest.mark.asyncio
+async def test_page_document_truncated_when_phrase_may_be_in_unread_part():
+    page = '<script>window.models.a = 1;</script><script>window.models.b = 2;</script>'
+    document = _PageDocument(StreamedResponse(page, chunk_size=8))
+    assert await document.extract('window.models.a = ') == 1
+    with pytest.raises(_DocumentTruncated):
+        await document.extract('window.models.b = ')
+
+
+@pytest.mark.asyncio
+async def test_extractor_refetches_page_when_data_was_not_read(api, aioresponse):
+    page = '<script>window.models.a = 1;</script>' + ' ' * 100 * 1024 + '<script>window.models.b = 2;</script>'
+    aioresponse.get(MAIN_PAGE_URL, body=page, repeat=True)
+
+    assert await api._get_window_models('', 'a') == 1
+    assert await api._get_window_models('', 'b') == 2
+    assert requests_count(aioresponse, MAIN_PAGE_URL) == 2
+
+
+@pytest.mark.parametrize('headers, expected', [
+    ({}, None),
+    ({'Retry-After': '120'}, 120),
+    ({'Retry-After': 'Wed, 21 Oct 2015 07:28:30 GMT'}, 30),
+    ({'Retry-After': 'garbage'}, None),
+])
+@pytest.mark.asyncio
+async def test_get_retry_after(api, aioresponse, headers, expected):
+    aioresponse.get(MAIN_PAGE_URL, status=429, headers=headers)
+    with freeze_time('2015-10-21 07:28:00'):
+        with pytest.raises(TooManyRequests) as e:
+            await api._request('GET', '', retry=False)
+        assert get_retry_after(e.value) == expected
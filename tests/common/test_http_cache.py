@@ -0,0 +1,122 @@
+from unittest.mock import patch
+
+import pytest
+from yarl import URL
+
+from http_cache import HttpCache, CachePolicy
+from webservice import AuthorizedHumbleAPI
+
+
+ORDER_LIST_URL = "https://www.humblebundle.com/api/v1/user/order"
+
+
+@pytest.fixture
+def http_cache(tmp_path):
+    return HttpCache(tmp_path / 'http_cache')
+
+
+@pytest.fixture
+def api(http_cache):
+    return AuthorizedHumbleAPI(headers={}, http_cache=http_cache)
+
+
+def sent_headers(aioresponse, url, call=-1):
+    return aioresponse.requests[('get', URL(url))][call].kwargs.get('headers') or {}
+
+
+def test_key_includes_params():
+    assert HttpCache.make_key('https://a.com/x', [('a', '1')]) != HttpCache.make_key('https://a.com/x', [('a', '2')])
+    assert HttpCache.make_key('https://a.com/x', {'a': '1'}) == HttpCache.make_key('https://a.com/x?a=1')
+
+
+@pytest.mark.parametrize('headers, expected', [
+    ({}, False),
+    ({'ETag': '"abc"'}, True),
+    ({'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'}, True),
+    ({'ETag': '"abc"', 'Cache-Control': 'no-store'}, False),
+])
+def test_is_cacheable(headers, expected):
+    assert HttpCache.is_cacheable(headers) == expected
+
+
+@pytest.mark.asyncio
+async def test_store_and_read(http_cache):
+    http_cache.store('k', 'https://a.com', {'ETag': '"abc"', 'Server': 'x'}, b'{"a": 1}')
+    entry = http_cache.get('k')
+    assert entry.validators == {'If-None-Match': '"abc"'}
+    assert 'Server' not in entry.headers
+    assert await http_cache.response('k').json() == {"a": 1}
+
+
+def test_persisted_between_instances(tmp_path):
+    HttpCache(tmp_path).store('k', 'https://a.com', {'ETag': '"abc"'}, b'body')
+    assert HttpCache(tmp_path).get('k').size == 4
+
+
+def test_lru_eviction(tmp_path):
+    cache = HttpCache(tmp_path, max_size=10)
+    with patch('http_cache.time.time', side_effect=[1, 2, 3, 4]):
+        cache.store('old', 'https://a.com/old', {'ETag': '"1"'}, b'12345')
+        cache.store('new', 'https://a.com/new', {'ETag': '"2"'}, b'12345')
+        cache.response('old')  # used recently
+        cache.store('newest', 'https://a.com/newest', {'ETag': '"3"'}, b'12345')
+    assert cache.get('new') is None
+    assert cache.get('old') is not None
+    assert cache.get('newest') is not None
+    assert cache.size == 10
+
+
+def test_bind_other_owner_clears_cache(http_cache):
+    http_cache.bind_owner('user1')
+    http_cache.store('k', 'https://a.com', {'ETag': '"abc"'}, b'body')
+    http_cache.bind_owner('user1')
+    assert http_cache.get('k') is not None
+    http_cache.bind_owner('user2')
+    assert http_cache.get('k') is None
+
+
+@pytest.mark.asyncio
+async def test_api_conditional_request_uses_stored_body_on_not_modified(api, aioresponse):
+    aioresponse.get(ORDER_LIST_URL, status=200, payload=[{'gamekey': 'a'}], headers={'ETag': '"v1"'})
+    aioresponse.get(ORDER_LIST_URL, status=304)
+
+    assert await api.get_gamekeys() == ['a']
+    assert await api.get_gamekeys() == ['a']
+
+    assert 'If-None-Match' not in sent_headers(aioresponse, ORDER_LIST_URL, 0)
+    assert sent_headers(aioresponse, ORDER_LIST_URL, 1)['If-None-Match'] == '"v1"'
+
+
+@pytest.mark.asyncio
+async def test_api_stores_new_body_on_modified(api, aioresponse):
+    aioresponse.get(ORDER_LIST_URL, status=200, payload=[{'gamekey': 'a'}], headers={'ETag': '"v1"'})
+    aioresponse.get(ORDER_LIST_URL, status=200, payload=[{'gamekey': 'b'}], headers={'ETag': '"v2"'})
+    aioresponse.get(ORDER_LIST_URL, status=304)
+
+    await api.get_gamekeys()
+    assert await api.get_gamekeys() == ['b']
+    assert await api.get_gamekeys() == ['b']
+    assert sent_headers(aioresponse, ORDER_LIST_URL)['If-None-Match'] == '"v2"'
+
+
+@pytest.mark.asyncio
+async def test_api_fresh_entry_served_without_request(api, aioresponse):
+    aioresponse.get(ORDER_LIST_URL, status=200, payload=[{'gamekey': 'a'}], headers={'ETag': '"v1"'})
+    with patch.dict(api.HTTP_CACHE_POLICIES, {api._endpoint_family('api/v1/user/order'): CachePolicy(max_age=60)}):
+        await api.get_gamekeys()
+        assert await api.get_gamekeys() == ['a']
+    assert len(aioresponse.requests[('get', URL(ORDER_LIST_URL))]) == 1
+
+
+@pytest.mark.parametrize('path, family', [
+    ('api/v1/user/order', 'orders'),
+    ('/api/v1/order/abc', 'orders'),
+    ('api/v1/orders', 'orders'),
+    ('api/v1/subscriptions/humble_monthly/subscription_products_with_gamekeys/', 'subscription'),
+    ('api/v1/user/download/sign', 'download'),
+    ('humbler/redeemdownload', 'download'),
+    ('membership/home', 'pages'),
+    ('', 'pages'),
+])
+def test_endpoint_family(path, family):
+    assert AuthorizedHumbleAPI._endpoint_family(path).value == family
@@ -2,6 +2,7 @@ from functools import partial
 from unittest.mock import MagicMock, Mock, PropertyMock
 
 from freezegun import freeze_time
+from galaxy.api.errors import TooManyRequests
 import pytest
 
 from consts import SOURCE
@@ -77,8 +78,8 @@ class TestFetchOrdersViaBulkAPI:
     
     @pytest.fixture(autouse=True)
     def resolver(self, create_resolver):
-        resolver = create_resolver(Mock())
-        self.fetch = resolver._fetch_orders
+        self.resolver = create_resolver(Mock())
+        self.fetch = self.resolver._fetch_orders
 
     @pytest.mark.parametrize('orders, expected', [
         pytest.param(
@@ -112,7 +113,38 @@ class TestFetchOrdersViaBulkAPI:
         assert len(result) == 82
         assert api_mock.get_gamekeys.call_count == 1
         assert api_mock.get_orders_bulk_details.call_count == 3
-    
+
+    async def test_chunk_size_limited_by_url_length(self, api_mock):
+        mock_gamekeys = [f'{i:016d}' for i in range(500)]
+        api_mock.get_gamekeys.return_value = mock_gamekeys
+        api_mock.get_orders_bulk_details.side_effect = lambda gamekeys: {gk: None for gk in gamekeys}
+
+        for _ in range(3):
+            await self.fetch()
+
+        for call in api_mock.get_orders_bulk_details.call_args_list:
+            gamekeys = call[0][0]
+            url_length = len('https://www.humblebundle.com/api/v1/orders?all_tpkds=true') + 26 * len(gamekeys)
+            assert url_length <= LibraryResolver.MAX_ORDERS_URL_LENGTH
+
+    async def test_chunk_size_grows_when_responses_are_fast(self, api_mock):
+        api_mock.get_gamekeys.return_value = [f'key{i}' for i in range(200)]
+        api_mock.get_orders_bulk_details.side_effect = lambda gamekeys: {gk: None for gk in gamekeys}
+
+        await self.fetch()
+
+        assert self.resolver.orders_fetch_params['chunk_size'] > LibraryResolver.ORDERS_CHUNK_SIZE
+
+    async def test_chunk_size_and_concurrency_drops_when_throttled(self, api_mock):
+        api_mock.get_gamekeys.return_value = [f'key{i}' for i in range(10)]
+        api_mock.get_orders_bulk_details.side_effect = TooManyRequests()
+        initial_limit = self.resolver.orders_fetch_params['limit']
+
+        with pytest.raises(TooManyRequests):
+            await self.fetch()
+
+        assert self.resolver.orders_fetch_params['limit'] < initial_limit
+
 
 # --------test splitting keys -------------------
 
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from freezegun import freeze_time
+
+from utils.concurrency import AIMDLimiter
+
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_limit_blocks_acquire():
+    limiter = AIMDLimiter(initial=2)
+    await limiter.acquire()
+    await limiter.acquire()
+    third = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not third.done()
+
+    await limiter.release(latency=0.1)
+    await asyncio.wait_for(third, 1)
+
+
+async def test_additive_increase_after_window_of_healthy_operations():
+    limiter = AIMDLimiter(initial=2, maximum=3)
+    for _ in range(3):
+        await limiter.acquire()
+        await limiter.release(latency=0.1)
+    assert limiter.limit == 3
+    for _ in range(10):
+        await limiter.acquire()
+        await limiter.release(latency=0.1)
+    assert limiter.limit == 3
+
+
+@pytest.mark.parametrize('overloaded, latency', [
+    (True, 0.1),
+    (False, 10),
+])
+async def test_multiplicative_decrease(overloaded, latency):
+    limiter = AIMDLimiter(initial=8, target_latency=5)
+    await limiter.acquire()
+    await limiter.release(latency=latency, overloaded=overloaded)
+    assert limiter.limit == 4
+
+
+async def test_decrease_once_for_concurrent_failures():
+    limiter = AIMDLimiter(initial=8)
+    for _ in range(4):
+        await limiter.acquire()
+    for _ in range(4):
+        await limiter.release(latency=1, overloaded=True)
+    assert limiter.limit == 4
+    assert limiter.stats['overloads'] == 4
+
+
+async def test_never_below_minimum():
+    limiter = AIMDLimiter(initial=2, minimum=1)
+    with freeze_time('2020-01-01 00:00:00') as frozen_time:
+        for _ in range(5):
+            await limiter.acquire()
+            await limiter.release(latency=1, overloaded=True)
+            frozen_time.tick(10)
+    assert limiter.limit == 1
+
+
+async def test_retry_after_pauses_next_acquire():
+    limiter = AIMDLimiter()
+    await limiter.acquire()
+    await limiter.release(latency=1, overloaded=True, retry_after=30)
+    assert 29 < limiter.stats['paused_for'] <= 30
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(limiter.acquire(), 0.1)
@@ -105,7 +105,13 @@ def _initialize_plugin() -> HumbleBundlePlugin:
 
 
 @pytest.fixture
-async def plugin_with_api(settings, humbleapp_client_mock, mocker):
+def plugin_data_dir(tmp_path, mocker):
+    mocker.patch('plugin.PLUGIN_DATA_DIR', tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+async def plugin_with_api(settings, humbleapp_client_mock, plugin_data_dir, mocker):
     mocker.patch('settings.Settings', return_value=settings)
     mocker.patch('plugin.HumbleAppClient', return_value=humbleapp_client_mock)
 
@@ -115,7 +121,7 @@ async def plugin_with_api(settings, humbleapp_client_mock, mocker):
 
 
 @pytest.fixture
-async def plugin(api_mock, settings, humbleapp_client_mock, mocker):
+async def plugin(api_mock, settings, humbleapp_client_mock, plugin_data_dir, mocker):
     mocker.patch('plugin.AuthorizedHumbleAPI', return_value=api_mock)
     mocker.patch('settings.Settings', return_value=settings)
     mocker.patch('plugin.HumbleAppClient', return_value=humbleapp_client_mock)